@@ -4,6 +4,11 @@ def create_db():
     conn = sqlite3.connect('app/price_tracker.db')
     c = conn.cursor()
 
+    # WAL is persistent, so readers no longer block behind writers on this file
+    c.execute('PRAGMA journal_mode=WAL')
+    c.execute('PRAGMA synchronous=NORMAL')
+    c.execute('PRAGMA busy_timeout=5000')
+
     c.execute('''
         CREATE TABLE IF NOT EXISTS price_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -14,6 +19,8 @@ def create_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    # auto_tracker looks up each product's last recorded price by URL
+    c.execute('CREATE INDEX IF NOT EXISTS idx_price_history_url ON price_history(url)')
 
     conn.commit()
     conn.close()
@@ -1,30 +1,68 @@
 import csv
-import schedule
+import sqlite3
 import time
-from scripts.tracker import track_price
+from concurrent.futures import ThreadPoolExecutor
+from db import create_db
+from scripts.scraper import get_flipkart_price
+from scripts.telegram_alert import send_telegram_alert
 
+PRODUCTS_CSV = 'app/products.csv'
+DB_PATH = 'app/price_tracker.db'  # same file db.create_db() sets up
+MAX_WORKERS = 4               # products checked in parallel
+
+
+def track_price(url, target_price):
+    """Scrapes one product, records it in price_history and alerts on Telegram when the price
+    drops to or below target. A price that stays below target is only alerted once, so a
+    2-hourly cron doesn't repeat the same alert all day."""
+    title, price = get_flipkart_price(url)
+    if not price:
+        print("❌ Could not fetch product info.")
+        return
+
+    print(f"✅ {title} - ₹{price} (target ₹{target_price})")
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        with conn:
+            previous = conn.execute(
+                "SELECT current_price FROM price_history WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)).fetchone()
+            conn.execute(
+                "INSERT INTO price_history (product_name, url, current_price, target_price) VALUES (?,?,?,?)",
+                (title, url, price, target_price))
+    finally:
+        conn.close()
+
+    # Alert on the crossing only: the last recorded price was above target (or there was none)
+    if price <= target_price and (previous is None or previous[0] > target_price):
+        send_telegram_alert(f"🚨 Price drop!\n\n{title}\nCurrent: ₹{price}\nTarget: ₹{target_price}\n{url}")
+
+
+def load_products():
+    """Returns [(name, url, target)] from products.csv."""
+    with open(PRODUCTS_CSV, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        return [(row['product_name'], row['url'], float(row['target_price'])) for row in reader]
+
+
+def check_product(product):
+    name, url, target = product
+    print(f"\n🔎 Checking: {name}")
+    try:
+        track_price(url, target)
+    except Exception as e:
+        print(f"⚠️ Check failed for {name}:", e)
 
 
 def check_all_products():
     print(f"\n🕒 Checking prices at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    with open('app/products.csv', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            name = row['product_name']
-            url = row['url']
-            target = float(row['target_price'])
-            print(f"\n🔎 Checking: {name}")
-            track_price(url, target)
-
-# 🔁 Schedule it: every X minutes/hours
-schedule.every(2).hours.do(check_all_products)
-# You can also try: schedule.every(30).minutes.do(...)
-
-# 🔁 Initial run
-check_all_products()
-
-# 🕰️ Keep running forever
-while True:
-    schedule.run_pending()
-    time.sleep(60)
+
+    # Each check is mostly network wait, so run them side by side
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        list(pool.map(check_product, load_products()))
+
+
+# 🔁 One pass per run; scheduling is left to cron / a systemd timer / Railway Cron
+# so no Python process sits idle between checks.
+if __name__ == "__main__":
+    create_db()
+    check_all_products()
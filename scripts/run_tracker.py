@@ -1,5 +1,8 @@
 import csv
-from scripts.tracker import track_price
+from db import create_db
+from scripts.auto_tracker import track_price
+
+create_db()
 
 # Flipkart product URL
 with open('app/products.csv', newline='', encoding='utf-8') as csvfile:
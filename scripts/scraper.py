@@ -1,49 +1,159 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+import atexit
+import json
 import time
 import random
+import threading
+from lxml import html as lxml_html
+from tracker_core import make_session, response_encoding
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+SESSION = make_session()
+SESSION.headers.update(HEADERS)
+
+# Flipkart class names: current layout first, older layouts after
+TITLE_CLASSES = ("VU-ZEz", "B_NuCI")
+PRICE_CLASSES = ("Nx9bqj", "_30jeq3")
+
+
+def _first_text(doc, classes):
+    for cls in classes:
+        nodes = doc.xpath(f'//*[contains(concat(" ", normalize-space(@class), " "), " {cls} ")]')
+        if nodes:
+            return nodes[0].text_content().strip()
+    return None
+
+
+def _parse_price(price_text):
+    # Clean ₹ symbol and commas
+    return float(price_text.replace("₹", "").replace(",", "").strip())
+
+
+def _from_json_ld(doc):
+    # Many product pages also embed a schema.org Product block
+    for raw in doc.xpath('//script[@type="application/ld+json"]/text()'):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for entry in (data if isinstance(data, list) else [data]):
+            if not isinstance(entry, dict) or entry.get("@type") != "Product":
+                continue
+            offers = entry.get("offers") or {}
+            if isinstance(offers, list):
+                offers = offers[0] if offers else {}
+            if offers.get("price") is not None:
+                return entry.get("name"), float(offers["price"])
+    return None, None
+
+
+def _get_flipkart_price_static(url):
+    # Flipkart product pages are server-rendered, so a plain GET + lxml parse is enough
+    resp = SESSION.get(url, timeout=10)
+    resp.raise_for_status()
+    # Decode with the HTTP charset: from bytes, lxml reads pages without <meta charset> as Latin-1
+    doc = lxml_html.fromstring(resp.content.decode(response_encoding(resp), "replace"))
+
+    title = _first_text(doc, TITLE_CLASSES)
+    price_text = _first_text(doc, PRICE_CLASSES)
+    if title and price_text:
+        return title, _parse_price(price_text)
+    return _from_json_ld(doc)
+
+
+# One Chrome instance per process, started on first use. Launching Chrome (and the
+# ChromeDriverManager CDN probe) costs seconds, so we pay it once rather than per product.
+_DRIVER = None
+_DRIVER_LOCK = threading.Lock()  # a WebDriver can only drive one page at a time
+
+
+def _get_driver():
+    global _DRIVER
+    if _DRIVER is None:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
 
-def get_flipkart_price(url):
-    try:
         # Setup Chrome options
         options = Options()
-        # Uncomment below line to run without opening browser window
-        # options.add_argument("--headless")
+        options.add_argument("--headless=new")
         options.add_argument("--disable-gpu")
         options.add_argument("--window-size=1920,1080")
         options.add_argument('--disable-blink-features=AutomationControlled')
 
         # Start Chrome driver
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        driver.get(url)
+        _DRIVER = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        atexit.register(_quit_driver)
+    return _DRIVER
+
+
+def _quit_driver():
+    global _DRIVER
+    if _DRIVER is not None:
+        try:
+            _DRIVER.quit()
+        except Exception:
+            pass
+        _DRIVER = None
+
+
+def _get_flipkart_price_selenium(url):
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
 
-        # 💤 Wait like a human before scraping
-        sleep_time = random.uniform(3, 6)
-        print(f"⏳ Sleeping for {round(sleep_time, 2)} seconds to avoid detection...")
-        time.sleep(sleep_time)
+    with _DRIVER_LOCK:
+        try:
+            driver = _get_driver()
+            driver.get(url)
 
-        # Wait for the title to appear
-        wait = WebDriverWait(driver, 10)
+            # 💤 Wait like a human before scraping
+            sleep_time = random.uniform(3, 6)
+            print(f"⏳ Sleeping for {round(sleep_time, 2)} seconds to avoid detection...")
+            time.sleep(sleep_time)
 
-        # 🆕 Updated Flipkart class names
-        title_elem = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "VU-ZEz")))
-        title = title_elem.text.strip()
+            # Wait for the title to appear
+            wait = WebDriverWait(driver, 10)
 
-        price_elem = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "Nx9bqj")))
-        price_text = price_elem.text.strip()
+            title_elem = wait.until(EC.presence_of_element_located((By.CLASS_NAME, TITLE_CLASSES[0])))
+            title = title_elem.text.strip()
 
-        # Clean ₹ symbol and commas
-        price = float(price_text.replace("₹", "").replace(",", ""))
+            price_elem = wait.until(EC.presence_of_element_located((By.CLASS_NAME, PRICE_CLASSES[0])))
+            price = _parse_price(price_elem.text)
 
-        driver.quit()
-        return title, price
+            # Don't let one product's session leak into the next
+            driver.delete_all_cookies()
+            return title, price
 
+        except TimeoutException as e:
+            # Page loaded but the selectors never appeared; the browser itself is fine
+            print("⚠️ Selenium scraping error:", e)
+            return None, None
+
+        except WebDriverException as e:
+            print("⚠️ Selenium scraping error:", e)
+            # The browser may have crashed; start a fresh one next time
+            _quit_driver()
+            return None, None
+
+        except Exception as e:
+            print("⚠️ Selenium scraping error:", e)
+            return None, None
+
+
+def get_flipkart_price(url):
+    try:
+        title, price = _get_flipkart_price_static(url)
+        if title and price:
+            return title, price
+        print("⚠️ Price not found in static HTML, falling back to Selenium...")
     except Exception as e:
-        print("⚠️ Selenium scraping error:", e)
-        driver.quit()
-        return None, None
+        print("⚠️ Static scraping error:", e)
+
+    # Only pay for a browser when the plain HTML didn't have what we need
+    return _get_flipkart_price_selenium(url)
@@ -1,24 +1,25 @@
-import requests
 import os
 from dotenv import load_dotenv
+from tracker_core import make_session, post_telegram
 
-load_dotenv()  # Load variables from .env
+load_dotenv()  # Load variables from .env (runs once, on first import)
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 
+# Keep one TLS connection to api.telegram.org alive across alerts
+SESSION = make_session()
+
 
 def send_telegram_alert(message):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    data = {
-        "chat_id": CHAT_ID,
-        "text": message
-    }
-    response = requests.post(url, data=data)
+    # post_telegram bounds the request (timeout=10), so a stalled connection can't hang an auto_tracker run
+    response = post_telegram(SESSION, BOT_TOKEN, CHAT_ID, message)
     if response.status_code == 200:
         print("✅ Telegram alert sent!")
     else:
         print("❌ Failed to send alert:", response.text)
 
-# 🔁 Test it
-send_telegram_alert("🚨 Test: Price drop detected!")
+# 🔁 Test it (only when run directly, never on import)
+if __name__ == "__main__":
+    send_telegram_alert("🚨 Test: Price drop detected!")
+
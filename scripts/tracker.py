@@ -4,17 +4,29 @@ import time
 import uuid
 import sqlite3
 import threading
+import queue
+import json
 import logging
 import re
-import requests
-from flask import Flask, request, jsonify
-from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from lxml import etree, html as lxml_html
+from flask import Flask, Response, request, jsonify
+from concurrent.futures import ThreadPoolExecutor, wait
+from tracker_core import open_connection, make_session
 
 # --- config & logging ---
 DB_FILE = os.environ.get("DB_FILE", "prices.db")
 POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", 60))
 PORT = int(os.environ.get("PORT", 5000))
-MAX_WORKERS = 5  # Max concurrent HTTP requests
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", 16))  # Max concurrent HTTP requests
+OPTIMIZE_INTERVAL = 15 * 60  # seconds between PRAGMA optimize runs
+MAX_PAGE_BYTES = int(os.environ.get("MAX_PAGE_BYTES", 262144))  # prices sit near the top of product pages
+READ_CHUNK = 65536
+RAW_TEXT_MAX = 64  # chars of matched/error text kept per price row
+PRICES_CACHE_TTL = 5  # seconds a serialized /prices response is reused
+WRITE_BATCH = 256  # max price rows per transaction
+WRITE_FLUSH_INTERVAL = 1.0  # seconds a queued price row may wait before being flushed
+PRICE_RETENTION = int(os.environ.get("PRICE_RETENTION", 180 * 86400))  # seconds of history to keep
 
 LOG = logging.getLogger("tracker")
 LOG.setLevel(logging.INFO)
@@ -24,29 +36,65 @@ LOG.addHandler(h)
 
 app = Flask(__name__)
 
+# --- HTTP session ---
+# One keep-alive pool for all fetch workers, so each poll doesn't redo the TCP+TLS handshake
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+# The pool is sized for MAX_WORKERS, and throttling/5xx responses are retried: a failed
+# fetch here is only retried by the next poll cycle
+SESSION = make_session(pool_maxsize=max(32, MAX_WORKERS), retries=3,
+                       status_forcelist=(429, 500, 502, 503, 504))
+SESSION.headers.update(HEADERS)
+
 # Lock for synchronizing DB writes to prevent "database is locked" errors
 DB_LOCK = threading.Lock()
 
 # --- DB helpers ---
+# One connection per thread, opened on first use. The poller, writer and fetch-pool threads
+# live for the whole process and keep theirs; Flask serves each request on a fresh thread,
+# so a request's connection is closed when its app context tears down (see close_request_db).
+# isolation_level=None = autocommit; multi-statement writes use explicit BEGIN IMMEDIATE/COMMIT.
+# timeout=10 is the busy timeout.
+_tls = threading.local()
+
 def get_db_conn():
-    conn = sqlite3.connect(DB_FILE, timeout=10)
+    conn = getattr(_tls, "conn", None)
+    if conn is not None:
+        return conn
+    # page_size only takes effect on a brand-new file, i.e. the first connection (init_db's)
+    conn = open_connection(DB_FILE, page_size=8192, timeout=10, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row # Allows accessing columns by name
+    _tls.conn = conn
     return conn
 
+@app.teardown_appcontext
+def close_request_db(exc):
+    conn = getattr(_tls, "conn", None)
+    if conn is not None:
+        conn.close()
+        _tls.conn = None
+
 def init_db():
     with DB_LOCK:
+        # WAL (set by open_connection) lets pool workers write while API requests read
         conn = get_db_conn()
         c = conn.cursor()
-        # Enable Write-Ahead Logging for better concurrency
-        c.execute('PRAGMA journal_mode=WAL;')
+        c.execute('BEGIN IMMEDIATE')
         
         c.execute('''
           CREATE TABLE IF NOT EXISTS items (
             id TEXT PRIMARY KEY,
             name TEXT,
-            url TEXT
+            url TEXT,
+            site TEXT
           )
         ''')
+        # Older DBs: add the site column and classify existing items once
+        if 'site' not in [r['name'] for r in c.execute('PRAGMA table_info(items)')]:
+            c.execute('ALTER TABLE items ADD COLUMN site TEXT')
+        for row in c.execute('SELECT id, url FROM items WHERE site IS NULL').fetchall():
+            c.execute('UPDATE items SET site=? WHERE id=?', (detect_site(row['url']), row['id']))
         c.execute('''
           CREATE TABLE IF NOT EXISTS prices (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,92 +104,228 @@ def init_db():
             raw_text TEXT
           )
         ''')
-        # Add index for faster history lookups
-        c.execute('CREATE INDEX IF NOT EXISTS idx_prices_item ON prices(item_id);')
-        conn.commit()
-        conn.close()
+        # Composite index: latest-price lookups and history pages become index seeks.
+        # It covers every query the old item_id-only index served, so drop that one.
+        c.execute('CREATE INDEX IF NOT EXISTS idx_prices_item_checked ON prices(item_id, checked_at DESC);')
+        c.execute('DROP INDEX IF EXISTS idx_prices_item;')
+        # Lets the poller's retention prune seek to the old rows instead of scanning the table under DB_LOCK
+        c.execute('CREATE INDEX IF NOT EXISTS idx_prices_checked_at ON prices(checked_at);')
+        c.execute('COMMIT')
         LOG.info("DB initialized (%s) with WAL mode", DB_FILE)
 
 def db_write(query, params=()):
     """Thread-safe write operation."""
     with DB_LOCK:
-        conn = get_db_conn()
-        try:
-            c = conn.cursor()
-            c.execute(query, params)
-            conn.commit()
-        finally:
-            conn.close()
+        # A single statement in autocommit mode is its own transaction
+        get_db_conn().execute(query, params)
 
 def db_read(query, params=(), one=False):
     """Read operation (doesn't strictly need lock in WAL mode, but safe)."""
+    rv = get_db_conn().execute(query, params).fetchall()
+    return (rv[0] if rv else None) if one else rv
+
+# --- /prices response cache ---
+# orjson serializes several times faster when installed; stdlib json is the fallback.
+try:
+    import orjson
+    dumps_json = orjson.dumps
+except ImportError:
+    def dumps_json(obj):
+        return json.dumps(obj).encode("utf-8")
+
+_prices_cache = None  # (built_at, serialized body)
+
+def invalidate_prices_cache():
+    global _prices_cache
+    _prices_cache = None
+
+# --- batched price writer ---
+# Fetch workers enqueue rows; one writer thread commits them in batches, so a poll cycle
+# costs one fsync per batch instead of one per item.
+price_queue = queue.Queue()
+writer_stop = threading.Event()
+
+def price_writer_loop():
     conn = get_db_conn()
-    try:
-        c = conn.cursor()
-        c.execute(query, params)
-        rv = c.fetchall()
-        return (rv[0] if rv else None) if one else rv
-    finally:
-        conn.close()
+    conn.execute('PRAGMA wal_autocheckpoint=1000')
+    LOG.info("Price writer started (batch=%d)", WRITE_BATCH)
+    while not (writer_stop.is_set() and price_queue.empty()):
+        try:
+            batch = [price_queue.get(timeout=WRITE_FLUSH_INTERVAL)]
+        except queue.Empty:
+            continue
+        deadline = time.time() + WRITE_FLUSH_INTERVAL
+        while len(batch) < WRITE_BATCH:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(price_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            with DB_LOCK:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    conn.executemany('INSERT INTO prices (item_id, checked_at, price, raw_text) VALUES (?,?,?,?)', batch)
+                    conn.execute('COMMIT')
+                    invalidate_prices_cache()
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+        except Exception:
+            LOG.exception("Price writer failed to store %d rows", len(batch))
 
 # --- simple price extraction heuristic ---
-# Note: Regex parsing HTML is fragile. Ideally, use BeautifulSoup.
-# This regex looks for currency symbols or standard number formats.
-PRICE_RE = re.compile(r'([₹$EUR€£]?\s?[\d,]+\.?\d{0,2})')
+# Note: Regex parsing HTML is fragile; the site selectors below are tried first.
+# This regex looks for a currency symbol followed by an amount.
+# RE2 (linear-time, no backtracking) is used when installed; the stdlib engine is the fallback.
+# Currency marker followed by an amount, grouped (1,299 / 1,29,999) or plain (1299), with optional
+# paise/cents. Group 1 is the bare number. RE2 has no lookahead, so the guard that stops a match
+# from ending inside a longer number consumes the character after it instead.
+PRICE_PATTERN = r'(?:₹|Rs\.?|\$|€|£|EUR)\s?((?:\d{1,3}(?:,\d{2,3})+|\d+)(?:\.\d{1,2})?)(?:[^\d,]|,\D|,$|$)'
+try:
+    import re2
+    PRICE_RE = re2.compile(PRICE_PATTERN)
+except Exception:
+    PRICE_RE = re.compile(PRICE_PATTERN)
 
 def extract_price_from_text(text):
+    """Returns (price, raw match) for the first currency amount in text, or (None, snippet).
+
+    >>> extract_price_from_text("Deal: ₹1299 only")[0]
+    1299.0
+    >>> extract_price_from_text("₹12999.00")[0]
+    12999.0
+    >>> extract_price_from_text("Rs. 2499, free delivery")[0]
+    2499.0
+    >>> extract_price_from_text("MRP ₹1,29,999")[0]
+    129999.0
+    >>> extract_price_from_text("$1,299.99")[0]
+    1299.99
+    >>> extract_price_from_text("Call 9876543210")[0] is None
+    True
+    """
     # 1. clean newlines to make searching easier
     clean_text = " ".join(text.split())
     
-    # 2. Try to find matches
-    matches = PRICE_RE.findall(clean_text)
-    if not matches:
+    # 2. The pattern requires a currency marker, so phone numbers and other bare digits never match.
+    # In a real app, you need CSS selectors. For now, we take the first logical match.
+    m = PRICE_RE.search(clean_text)
+    if m is None:
         return None, clean_text[:100] # Return snippet of text for debugging
+    # The match ends with the guard character; the raw text stops at the amount
+    return float(m.group(1).replace(',', '')), clean_text[m.start():m.end(1)]
 
-    # 3. Heuristic: First match is often garbage (e.g. phone number in header).
-    # In a real app, you need CSS selectors. For now, we take the first logical match.
-    for raw in matches:
-        # Remove currency symbols and commas to convert to float
-        cleaned = re.sub(r'[^\d.]', '', raw)
-        if not cleaned: continue
-        try:
-            val = float(cleaned)
-            return val, raw
-        except ValueError:
-            continue
-            
-    return None, matches[0] if matches else "no match"
+# --- site-specific parsing ---
+# The site is detected once when an item is tracked and stored in items.site,
+# so each fetch is a dict lookup instead of re-parsing the URL.
+def detect_site(url):
+    domain = urlparse(url).netloc.lower()
+    if "amazon." in domain:
+        return "amazon"
+    if "flipkart." in domain:
+        return "flipkart"
+    return "generic"
+
+def _has_class(*classes):
+    return " and ".join(f'contains(concat(" ", normalize-space(@class), " "), " {cls} ")' for cls in classes)
+
+# Compiled once at import; each fetch parses the page once and only regex-scans the
+# short text of the first matching node instead of the whole document.
+AMAZON_SELECTORS = tuple(etree.XPath(sel) for sel in (
+    '//*[@id="priceblock_ourprice"]',
+    f'//span[{_has_class("a-price")}]/span[{_has_class("a-offscreen")}]',
+    f'//*[@id="corePrice_feature_div"]//*[{_has_class("a-offscreen")}]',
+))
+FLIPKART_SELECTORS = tuple(etree.XPath(sel) for sel in (
+    f'//div[{_has_class("_30jeq3", "_16Jk6d")}]',
+    f'//div[{_has_class("_30jeq3")}]',
+    f'//div[{_has_class("Nx9bqj")}]',
+))
+
+def parse_with_selectors(text, selectors):
+    try:
+        doc = lxml_html.fromstring(text)
+    except (ValueError, etree.ParserError):
+        return extract_price_from_text(text)
+    for sel in selectors:
+        nodes = sel(doc)
+        if nodes:
+            price, raw = extract_price_from_text(nodes[0].text_content())
+            if price is not None:
+                return price, raw
+    # Selectors missed (layout change?) -> fall back to scanning the whole page
+    return extract_price_from_text(text)
+
+def parse_amazon(text):
+    return parse_with_selectors(text, AMAZON_SELECTORS)
+
+def parse_flipkart(text):
+    return parse_with_selectors(text, FLIPKART_SELECTORS)
+
+PARSERS = {
+    "amazon": parse_amazon,
+    "flipkart": parse_flipkart,
+    "generic": extract_price_from_text,
+}
 
 # --- fetch logic ---
-def fetch_price(item_id, url):
-    LOG.info("Fetching price for %s -> %s", item_id, url)
+# URLs currently being fetched, each with the ids of every item waiting on that fetch.
+# Items that share a URL are fetched once; a caller whose URL is already in flight adds its
+# ids to the running fetch, which records its result for all of them when it finishes.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def fetch_price(item_ids, url, site="generic"):
+    with _inflight_lock:
+        waiting = _inflight.get(url)
+        if waiting is not None:
+            waiting.update(item_ids)
+            LOG.info("Fetch already in flight for %s, adding %s to it", url, ",".join(item_ids))
+            return None
+        _inflight[url] = set(item_ids)
+    
+    LOG.info("Fetching price for %s -> %s", ",".join(item_ids), url)
     price = None
     raw = ""
     ts = time.time()
     
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        resp = requests.get(url, timeout=10, headers=headers)
-        resp.raise_for_status() # Check for 404/500 errors
-        
-        text = resp.text or ""
-        price, raw = extract_price_from_text(text)
-        
-        # Record success
-        db_write('INSERT INTO prices (item_id, checked_at, price, raw_text) VALUES (?,?,?,?)',
-                   (item_id, ts, price if price is not None else -1.0, raw))
+        # Stream the body and stop after MAX_PAGE_BYTES instead of buffering multi-MB pages
+        with SESSION.get(url, timeout=10, stream=True) as resp:
+            resp.raise_for_status() # Check for 404/500 errors
+            # Images, PDFs, JSON etc. can't carry a product price; don't download or decode them
+            content_type = resp.headers.get("Content-Type", "")
+            if content_type and "html" not in content_type.lower():
+                raise ValueError(f"non-HTML response ({content_type})")
+            body = bytearray()
+            for chunk in resp.iter_content(chunk_size=READ_CHUNK):
+                body += chunk
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
+            text = bytes(body[:MAX_PAGE_BYTES]).decode(resp.encoding or "utf-8", errors="replace")
         
-        LOG.info("Fetched %s -> price=%s", item_id, price)
-        return {"item_id": item_id, "price": price, "raw": raw, "checked_at": ts}
+        price, raw = PARSERS.get(site, extract_price_from_text)(text)
+        # raw_text is a short debugging aid, not a copy of the page
+        raw_text = raw[:RAW_TEXT_MAX]
+        LOG.info("Fetched %s -> price=%s", url, price)
 
     except Exception as e:
         LOG.error("Fetch failed for %s: %s", url, str(e))
-        # Record failure
-        db_write('INSERT INTO prices (item_id, checked_at, price, raw_text) VALUES (?,?,?,?)',
-                   (item_id, ts, -1.0, f"error: {str(e)}"))
-        return {"item_id": item_id, "price": None, "raw": str(e), "checked_at": ts}
+        raw = str(e)
+        raw_text = f"error: {raw}"[:RAW_TEXT_MAX]
+    
+    finally:
+        # Release the URL, taking the ids of every caller that joined while it was fetched
+        with _inflight_lock:
+            item_ids = list(_inflight.pop(url))
+    
+    # Record the result (or the failure) for each of them
+    stored_price = price if price is not None else -1.0
+    for item_id in item_ids:
+        price_queue.put((item_id, ts, stored_price, raw_text))
+    return {"item_ids": item_ids, "price": price, "raw": raw, "checked_at": ts}
 
 # --- background poller ---
 poller_stop = threading.Event()
@@ -149,14 +333,28 @@ executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 
 def poller_loop(interval=POLL_INTERVAL):
     LOG.info("Poller thread started (interval=%s)", interval)
+    last_optimize = time.time()
     while not poller_stop.is_set():
         start_time = time.time()
         try:
-            items = db_read('SELECT id, url FROM items')
+            items = db_read('SELECT id, url, site FROM items')
             if items:
-                # Use thread pool to avoid spawning 1000s of threads if many items exist
+                # One fetch per distinct URL, even if several items track the same page
+                by_url = {}
                 for row in items:
-                    executor.submit(fetch_price, row['id'], row['url'])
+                    by_url.setdefault(row['url'], (row['site'], []))[1].append(row['id'])
+                # Use thread pool to avoid spawning 1000s of threads if many items exist.
+                # Fetches are pure network wait, so they overlap on the shared keep-alive pool.
+                futures = [executor.submit(fetch_price, item_ids, url, site)
+                           for url, (site, item_ids) in by_url.items()]
+                # Finish this cycle before scheduling the next, so slow hosts can't grow an unbounded backlog
+                wait(futures)
+            # Bound table growth: drop history older than the retention window
+            db_write('DELETE FROM prices WHERE checked_at < ?', (time.time() - PRICE_RETENTION,))
+            # Keep query planner statistics fresh as the prices table grows
+            if time.time() - last_optimize >= OPTIMIZE_INTERVAL:
+                db_write('PRAGMA optimize')
+                last_optimize = time.time()
         except Exception:
             LOG.exception("Poller loop error")
         
@@ -180,27 +378,31 @@ def track():
         return jsonify({"error": "missing url"}), 400
         
     item_id = str(uuid.uuid4())
-    db_write('INSERT INTO items (id, name, url) VALUES (?,?,?)', (item_id, name, url))
+    site = detect_site(url)
+    db_write('INSERT INTO items (id, name, url, site) VALUES (?,?,?,?)', (item_id, name, url, site))
     
-    LOG.info("Added track item %s -> %s", item_id, url)
+    invalidate_prices_cache()
+    LOG.info("Added track item %s -> %s (%s)", item_id, url, site)
     # Trigger immediate fetch via pool
-    executor.submit(fetch_price, item_id, url)
+    executor.submit(fetch_price, [item_id], url, site)
     
     return jsonify({"id": item_id, "name": name, "url": url}), 201
 
 @app.route("/prices", methods=["GET"])
 def list_prices():
-    # OPTIMIZED: Single query instead of N+1 queries
+    global _prices_cache
+    cached = _prices_cache
+    if cached and time.time() - cached[0] < PRICES_CACHE_TTL:
+        return Response(cached[1], mimetype="application/json")
+    
+    # Single query; the correlated subquery is one idx_prices_item_checked seek per item
+    # instead of grouping the whole prices table
     query = '''
         SELECT i.id, i.name, i.url, p.price, p.checked_at 
         FROM items i
-        LEFT JOIN (
-            SELECT item_id, price, checked_at
-            FROM prices
-            WHERE id IN (
-                SELECT MAX(id) FROM prices GROUP BY item_id
-            )
-        ) p ON i.id = p.item_id
+        LEFT JOIN prices p ON p.id = (
+            SELECT id FROM prices WHERE item_id = i.id ORDER BY checked_at DESC LIMIT 1
+        )
     '''
     rows = db_read(query)
     
@@ -213,7 +415,9 @@ def list_prices():
             "last_price": row['price'],
             "last_checked": row['checked_at']
         })
-    return jsonify(out)
+    body = dumps_json(out)
+    _prices_cache = (time.time(), body)
+    return Response(body, mimetype="application/json")
 
 @app.route("/prices/<item_id>", methods=["GET"])
 def get_price_history(item_id):
@@ -223,17 +427,21 @@ def get_price_history(item_id):
 
 @app.route("/fetch/<item_id>", methods=["POST"])
 def trigger_fetch(item_id):
-    item = db_read('SELECT url FROM items WHERE id=?', (item_id,), one=True)
+    item = db_read('SELECT url, site FROM items WHERE id=?', (item_id,), one=True)
     if not item:
         return jsonify({"error": "not found"}), 404
     
-    executor.submit(fetch_price, item_id, item['url'])
+    executor.submit(fetch_price, [item_id], item['url'], item['site'])
     return jsonify({"status": "fetch_queued"}), 202
 
 # --- startup ---
 if __name__ == "__main__":
     init_db()
     
+    # Start the writer before anything can enqueue prices
+    writer = threading.Thread(target=price_writer_loop, daemon=True)
+    writer.start()
+    
     # Start poller thread
     t = threading.Thread(target=poller_loop, daemon=True)
     t.start()
@@ -245,3 +453,6 @@ if __name__ == "__main__":
         LOG.info("Shutting down...")
         poller_stop.set()
         executor.shutdown(wait=False)
+        # Flush whatever is still queued
+        writer_stop.set()
+        writer.join(timeout=5)
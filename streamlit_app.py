@@ -3,20 +3,33 @@ import sqlite3
 import time
 import threading
 import uuid
-import requests
 import os
-import pandas as pd
-import json 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+from lxml import etree, html as lxml_html
 from fake_useragent import UserAgent
+from tracker_core import (open_connection, add_column_if_missing, make_session, conditional_headers, post_telegram,
+                          response_encoding, carry_forward, validators_after, alert_due)
 
-# --- CRITICAL CONCURRENCY LOCK ---
-DB_LOCK = threading.Lock()
+# --- CRITICAL CONCURRENCY LOCKS ---
+# Cached as resources so every rerun and the poller thread share the same locks.
+# DB_LOCK guards the shared writer connection, READ_LOCK the shared read-only one.
+@st.cache_resource
+def get_db_locks():
+    return threading.Lock(), threading.Lock()
+
+DB_LOCK, READ_LOCK = get_db_locks()
 
 # --- CONFIGURATION ---
 POLL_INTERVAL = 1800  # 30 minutes
 ALERT_COOLDOWN = 43200 # 12 hours
+DASHBOARD_MAX_AGE = 30  # seconds before the cached watchlist is reloaded
+PRICE_RETENTION = 180 * 86400  # keep 180 days of price history
+ANALYZE_INTERVAL = 3600  # refresh query planner stats hourly
+FETCH_WORKERS = 8  # items fetched concurrently by the poller
+PER_HOST_FETCHES = 4  # at most this many of them against the same site
 
 # --- SECRETS MANAGEMENT (Crash-Proof) ---
 TELEGRAM_BOT_TOKEN = None
@@ -38,23 +51,50 @@ except Exception:
 def get_db_path():
     return os.path.join("/tmp", "prices.db") 
 
-def get_db_connection():
-    conn = sqlite3.connect(get_db_path(), check_same_thread=False) 
+# Poll-path statements as constants: identical strings hit sqlite3's per-connection statement cache
+SQL_INSERT_PRICE = 'INSERT INTO prices (item_id, checked_at, price, status) VALUES (?,?,?,?)'
+SQL_UPDATE_ITEM = '''UPDATE items SET last_icon = ?, last_label = ?, last_price_display = ?,
+                          last_price = ?, last_status = ?, last_checked_at = ?, etag = ?, last_modified = ?,
+                          last_alert_at = CASE WHEN ? THEN ? ELSE last_alert_at END
+                      WHERE id = ?'''
+
+def open_db_connection(read_only=False):
+    conn = open_connection(get_db_path(), read_only=read_only, timeout=5,
+                           check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Long-lived connections, opened once and shared by reruns and the poller instead of
+# paying an open + pragma round per call. Writes go through get_db_connection() under
+# DB_LOCK; dashboard reads use the read-only one under READ_LOCK, so they never wait on a write.
+@st.cache_resource
+def get_db_connection():
+    return open_db_connection()
+
+@st.cache_resource
+def get_read_connection():
+    return open_db_connection(read_only=True)
+
+# Schema check + migrations run once per process, not on every rerun. A failed run raises,
+# so it isn't cached and the next rerun tries again.
+@st.cache_resource
 def init_db():
     db_path = get_db_path()
     
     if os.path.exists(db_path):
         try:
-            with DB_LOCK:
-                conn = get_db_connection()
+            # Throwaway connection: a broken file must not end up cached
+            conn = open_db_connection()
+            try:
                 conn.execute("SELECT name FROM items LIMIT 1").fetchone()
+            finally:
                 conn.close()
         except Exception:
             print("DB file found but appears corrupted/locked. Deleting and recreating.")
             os.remove(db_path)
+            # Drop the cached connections so they reopen on the new file
+            get_db_connection.clear()
+            get_read_connection.clear()
             
     try:
         with DB_LOCK:
@@ -66,22 +106,54 @@ def init_db():
             c.execute('''CREATE TABLE IF NOT EXISTS prices 
                          (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id TEXT, checked_at REAL, price REAL, status TEXT)''')
             
-            c.execute('ALTER TABLE items ADD COLUMN IF NOT EXISTS target_price REAL DEFAULT 0')
-            c.execute('ALTER TABLE items ADD COLUMN IF NOT EXISTS last_alert_at REAL DEFAULT 0')
+            add_column_if_missing(c, 'items', 'target_price', 'REAL DEFAULT 0')
+            add_column_if_missing(c, 'items', 'last_alert_at', 'REAL DEFAULT 0')
+            # Display strings precomputed at poll time (see describe_price)
+            add_column_if_missing(c, 'items', 'last_icon', 'TEXT')
+            add_column_if_missing(c, 'items', 'last_label', 'TEXT')
+            add_column_if_missing(c, 'items', 'last_price_display', 'TEXT')
+            # Latest check result kept on the item itself, so the dashboard never searches prices for it
+            added = add_column_if_missing(c, 'items', 'last_price', 'REAL')
+            added |= add_column_if_missing(c, 'items', 'last_status', 'TEXT')
+            added |= add_column_if_missing(c, 'items', 'last_checked_at', 'REAL')
+            # HTTP validators from the last full fetch, for conditional GETs
+            add_column_if_missing(c, 'items', 'etag', 'TEXT')
+            add_column_if_missing(c, 'items', 'last_modified', 'TEXT')
+            if added:
+                c.execute('''UPDATE items SET (last_price, last_status, last_checked_at) =
+                                 (SELECT price, status, checked_at FROM prices
+                                  WHERE item_id = items.id ORDER BY id DESC LIMIT 1)''')
+            
+            # Per-item latest/history lookups and the retention prune become index seeks
+            c.execute('CREATE INDEX IF NOT EXISTS idx_prices_item_checked ON prices(item_id, checked_at DESC)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_prices_checked_at ON prices(checked_at DESC)')
+            # Partial index: valid-price history reads never touch error rows
+            c.execute('CREATE INDEX IF NOT EXISTS idx_prices_valid ON prices(item_id, checked_at DESC) WHERE price > 0')
             
             conn.commit()
-            conn.close()
     except Exception as e:
         print(f"FATAL: Database Initialization Failed: {e}")
+        raise
 
 # --- Scraping Logic (Omitted for brevity, assume correct) ---
 
+DEFAULT_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# UserAgent() loads its browser database on construction, so build it once per process
+@st.cache_resource
+def get_user_agent():
+    try:
+        return UserAgent()
+    except Exception:
+        return None
+
+_UA = get_user_agent()
+
 def get_random_headers():
     try:
-        ua = UserAgent()
-        user_agent = ua.random
-    except:
-        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        user_agent = _UA.random if _UA else DEFAULT_UA
+    except Exception:
+        user_agent = DEFAULT_UA
     return {
         "User-Agent": user_agent,
         "Accept-Language": "en-US,en;q=0.9",
@@ -89,57 +161,109 @@ def get_random_headers():
         "Connection": "keep-alive",
     }
 
-def parse_price_amazon(soup):
+# One keep-alive pool for every fetch and Telegram call. Cached as a resource because
+# Streamlit re-executes this script on every rerun, which would otherwise open a new pool.
+@st.cache_resource
+def get_http_session():
+    return make_session()
+
+SESSION = get_http_session()
+
+# Selectors are compiled once at import (XPath equivalents of the CSS class selectors)
+def class_xpath(cls):
+    return etree.XPath(f'//*[contains(concat(" ", normalize-space(@class), " "), " {cls} ")]')
+
+AMAZON_PRICE_WHOLE = class_xpath('a-price-whole')
+AMAZON_PRICE_OFFSCREEN = class_xpath('a-offscreen')
+GENERIC_PRICE_RE = re.compile(r'[₹$]\s?([\d,]+)')
+
+# Streaming: stop downloading once the bytes a parser needs have arrived
+FETCH_CHUNK = 16384
+FETCH_MAX_BYTES = 1_048_576  # never buffer more than this of a page
+# Anchored to a class attribute, so ".a-price-whole" in inline CSS/JS in <head> doesn't end the read early
+AMAZON_PRICE_MARKER = re.compile(rb'''class=["'](?:[^"']*\s)?a-price-whole["'\s]''')
+GENERIC_PRICE_MARKER = re.compile(rb'(?:\xe2\x82\xb9|\$)\s?[\d,]+')  # GENERIC_PRICE_RE on UTF-8 bytes
+
+def parse_price_amazon(tree):
     try:
-        price_element = soup.select_one('.a-price-whole')
+        price_element = AMAZON_PRICE_WHOLE(tree)
         if price_element:
-            return float(price_element.text.replace(',', '').replace('.', ''))
-        price_element = soup.select_one('.a-offscreen')
+            return float(price_element[0].text_content().replace(',', '').replace('.', ''))
+        price_element = AMAZON_PRICE_OFFSCREEN(tree)
         if price_element:
-            clean = price_element.text.replace('₹', '').replace('$', '').replace(',', '')
+            clean = price_element[0].text_content().replace('₹', '').replace('$', '').replace(',', '')
             return float(clean)
     except:
         pass
     return None
 
-def fetch_price_data(url):
+def parse_price_generic(tree):
+    match = GENERIC_PRICE_RE.search(tree.text_content())
+    if match: return float(match.group(1).replace(',', ''))
+    return None
+
+# Site-specific (parser, marker) pairs keyed by a substring of the host; anything else uses the generic parser
+PRICE_PARSERS = {
+    "amazon": (parse_price_amazon, AMAZON_PRICE_MARKER),
+}
+
+def get_price_parser(url):
+    host = urlparse(url).netloc.lower()
+    for site, parser in PRICE_PARSERS.items():
+        if site in host:
+            return parser
+    return parse_price_generic, GENERIC_PRICE_MARKER
+
+def read_until_marker(response, marker):
+    """Reads a streamed body until one chunk past the first marker match (so the element
+    it belongs to is complete), or FETCH_MAX_BYTES. lxml recovers the truncated document."""
+    body = bytearray()
+    found_at = None
+    for chunk in response.iter_content(chunk_size=FETCH_CHUNK):
+        body += chunk
+        if found_at is None:
+            # Rescan a little of the previous chunk in case the marker straddles the boundary
+            m = marker.search(body, max(0, len(body) - len(chunk) - 64))
+            if m: found_at = m.end()
+        if found_at is not None and len(body) - found_at >= FETCH_CHUNK:
+            break
+        if len(body) >= FETCH_MAX_BYTES:
+            break
+    return bytes(body)
+
+def fetch_price_data(url, etag=None, last_modified=None):
+    """Returns (price, status, etag, last_modified).
+    With validators from the last fetch this is a conditional GET; status is "Not Modified" on a 304."""
+    headers = conditional_headers(get_random_headers(), etag, last_modified)
     try:
-        session = requests.Session()
-        response = session.get(url, headers=get_random_headers(), timeout=15)
-        if response.status_code != 200: return None, f"Blocked ({response.status_code})"
-        
-        soup = BeautifulSoup(response.content, "html.parser")
-        price = None
+        parser, marker = get_price_parser(url)
+        with SESSION.get(url, headers=headers, timeout=15, stream=True) as response:
+            if response.status_code == 304: return None, "Not Modified", etag, last_modified
+            if response.status_code != 200: return None, f"Blocked ({response.status_code})", None, None
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            body = read_until_marker(response, marker)
+            encoding = response_encoding(response)
         
-        if "amazon" in url:
-            price = parse_price_amazon(soup)
-        else:
-            import re
-            text = soup.get_text()
-            matches = re.findall(r'[₹$]\s?([\d,]+)', text)
-            if matches: price = float(matches[0].replace(',', ''))
+        # lxml parses in C; html.parser built the whole tree in pure Python.
+        # Decode first: given bytes, lxml ignores the HTTP charset and reads pages without
+        # a <meta charset> as Latin-1. "replace" covers a character cut off by the early stop.
+        tree = lxml_html.fromstring(body.decode(encoding, "replace"))
+        price = parser(tree)
             
-        if price: return price, "Success"
-        return None, "Parse Fail"
+        if price: return price, "Success", etag, last_modified
+        return None, "Parse Fail", etag, last_modified
     except Exception as e:
-        return None, f"Request Error: {e}"
+        return None, f"Request Error: {e}", None, None
 
 # --- Telegram Fix (Critical Update) ---
 def send_telegram_message(text):
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID: return False, "No Config"
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    
-    # Use explicit JSON payload and HTML parse mode
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID, 
-        "text": text, 
-        "parse_mode": "HTML", # <--- FIX APPLIED HERE
-        "disable_web_page_preview": True 
-    }
     
     try:
-        headers = {'Content-Type': 'application/json'}
-        r = requests.post(url, data=json.dumps(payload), headers=headers, timeout=10)
+        # HTML parse mode for the <b> tags in alerts
+        r = post_telegram(SESSION, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, text,
+                          parse_mode="HTML", disable_web_page_preview=True)
         
         if r.status_code == 200:
             return True, "Sent"
@@ -153,49 +277,97 @@ def send_telegram_message(text):
 # ----------------------------------------
 
 # --- Worker Logic ---
-def check_item_logic(item_id, name, url, target_price, last_alert):
-    price, status = fetch_price_data(url)
+def describe_price(price, target_price):
+    """Returns (icon, label, price_display) for the dashboard header of an item."""
+    if price is None or price <= 0:
+        return "⚠️", "Status: Pending", "Pending/Error"
+    price_display = f"₹{price:.2f}"
+    if price <= target_price and target_price > 0:
+        return "🔥", f"DEAL! ({price_display})", price_display
+    return "📈", f"Current: {price_display}", price_display
+
+def evaluate_item(item_id, name, url, target_price, last_alert, last_price=None, etag=None, last_modified=None):
+    """Fetches one item and sends its alert if due.
+    Returns the (price row, items row) pair for save_results."""
+    price, status, etag, last_modified = fetch_price_data(url, etag, last_modified)
+    if status == "Not Modified":
+        # Page unchanged since the last fetch: carry the last price forward without parsing
+        price = carry_forward(last_price)
+    etag, last_modified = validators_after(price, etag, last_modified)
     now = time.time()
     
+    # Alert before touching the DB so the Telegram round-trip never holds DB_LOCK
+    alerted = False
+    if alert_due(price, target_price, last_alert, ALERT_COOLDOWN, now):
+        # Message uses HTML tags <b> for bold
+        msg = f"🚨 <b>DEAL ALERT!</b>\n\n📦 {name}\n💰 <b>Current:</b> ₹{price:.2f}\n🎯 <b>Target:</b> ₹{target_price:.2f}\n\n<a href='{url}'>Product Link</a>"
+        
+        alerted, err = send_telegram_message(msg)
+        if not alerted:
+            print(f"Alert failed for {name}: {err}") 
+    
+    icon, lbl, price_display = describe_price(price, target_price)
+    stored_price = price if price else -1
+    return ((item_id, now, stored_price, status),
+            (icon, lbl, price_display, stored_price, status, now, etag, last_modified, alerted, now, item_id))
+
+def save_results(results):
+    # One transaction for a whole batch: every price row plus a single UPDATE per item
+    # for the latest result, display snapshot and alert time
+    if not results:
+        return
     conn = get_db_connection()
     try:
-        with DB_LOCK:
-            conn.execute('INSERT INTO prices (item_id, checked_at, price, status) VALUES (?,?,?,?)',
-                         (item_id, now, price if price else -1, status))
-            
-            if price and price > 0 and target_price > 0 and price <= target_price:
-                if (now - last_alert) > ALERT_COOLDOWN:
-                    # Message uses HTML tags <b> for bold
-                    msg = f"🚨 <b>DEAL ALERT!</b>\n\n📦 {name}\n💰 <b>Current:</b> ₹{price:.2f}\n🎯 <b>Target:</b> ₹{target_price:.2f}\n\n<a href='{url}'>Product Link</a>"
-                    
-                    success, err = send_telegram_message(msg)
-                    if success:
-                        conn.execute('UPDATE items SET last_alert_at = ? WHERE id = ?', (now, item_id))
-                    else:
-                        print(f"Alert failed for {name}: {err}") 
-            
-            conn.commit()
+        with DB_LOCK, conn:
+            conn.executemany(SQL_INSERT_PRICE, [price_row for price_row, _ in results])
+            conn.executemany(SQL_UPDATE_ITEM, [item_row for _, item_row in results])
     except Exception as e:
-        print(f"DB Write Error in Poller for {name}: {e}")
-    finally:
-        conn.close()
-    return price, status
+        print(f"DB Write Error in Poller ({len(results)} items): {e}")
+
+def check_item_logic(item_id, name, url, target_price, last_alert):
+    result = evaluate_item(item_id, name, url, target_price, last_alert)
+    save_results([result])
+    price_row = result[0]
+    return (price_row[2] if price_row[2] > 0 else None), price_row[3]
+
+def prune_old_prices():
+    conn = get_db_connection()
+    with DB_LOCK, conn:
+        conn.execute('DELETE FROM prices WHERE checked_at < ?', (time.time() - PRICE_RETENTION,))
+
+def optimize_db():
+    # Keep planner statistics fresh so the indexes above stay in use as prices grows
+    conn = get_db_connection()
+    with DB_LOCK, conn:
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
 
 # --- Background Thread ---
 @st.cache_resource
 def start_poller():
     def run():
+        last_analyze = 0
         while True:
             try:
-                with DB_LOCK:
-                    conn = get_db_connection()
-                    conn.row_factory = sqlite3.Row
-                    items = conn.execute('SELECT * FROM items').fetchall()
-                    conn.close()
+                with READ_LOCK:
+                    items = get_read_connection().execute('SELECT id, name, url, target_price, last_alert_at, last_price, etag, last_modified FROM items').fetchall()
+                
+                # Fetches are I/O-bound, so overlap them; the DB write stays a single batch.
+                # A per-host cap keeps us polite to each site while different sites proceed in parallel.
+                host_slots = {urlparse(row[2]).netloc: threading.BoundedSemaphore(PER_HOST_FETCHES) for row in items}
                 
-                for row in items:
-                    check_item_logic(row['id'], row['name'], row['url'], row['target_price'], row['last_alert_at'])
-                    time.sleep(10) 
+                def evaluate_politely(row):
+                    with host_slots[urlparse(row[2]).netloc]:
+                        return evaluate_item(*row)
+                
+                with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                    results = list(pool.map(evaluate_politely, items))
+                save_results(results)
+                
+                prune_old_prices()
+                if time.time() - last_analyze >= ANALYZE_INTERVAL:
+                    optimize_db()
+                    last_analyze = time.time()
             except Exception as e:
                 print(f"Poller Loop Failed: {e}")
                 
@@ -204,10 +376,47 @@ def start_poller():
     t = threading.Thread(target=run, daemon=True)
     t.start()
 
+@st.cache_resource
+def get_fetch_executor():
+    # Shared across reruns so one-off fetches (e.g. for newly added items) don't block the UI
+    return ThreadPoolExecutor(max_workers=4)
+
+# --- Dashboard Data ---
+def dashboard_version():
+    # Cheap fingerprint of the watchlist: changes whenever the poller records a check
+    # or an item is added/removed, so the cached DataFrame below is reused until then
+    with READ_LOCK:
+        return tuple(get_read_connection().execute('SELECT MAX(last_checked_at), COUNT(*) FROM items').fetchone())
+
+@st.cache_data(ttl=DASHBOARD_MAX_AGE)
+def load_dashboard(version=None):
+    """Returns the watchlist as a list of dicts, one per item.
+    Rows are only rendered, so no DataFrame is built for them."""
+    with READ_LOCK:
+        # The poller keeps the latest result on items, so this is a plain read of one table
+        rows = get_read_connection().execute('''
+            SELECT id, name, url, target_price, 
+                   last_icon, last_label, last_price_display,
+                   last_price AS current_price, last_status AS status, last_checked_at AS checked_at
+            FROM items
+        ''').fetchall()
+    
+    items = [dict(row) for row in rows]
+    for item in items:
+        checked_at = item['checked_at']
+        item['checked_at_str'] = datetime.fromtimestamp(checked_at).strftime('%Y-%m-%d %H:%M') if checked_at else 'Never'
+    return items
+
+def invalidate_dashboard():
+    load_dashboard.clear()
+
 # --- MAIN UI ---
 def main():
     st.set_page_config(page_title="Price Tracker", layout="wide")
-    init_db()
+    try:
+        init_db()
+    except Exception:
+        pass  # already logged; the data loaders below show the "initializing" notice
     start_poller()
     
     st.title("☁️ Cloud Price Tracker")
@@ -224,68 +433,49 @@ def main():
                 if url:
                     item_name = name or url[:30]
                     try:
-                        with DB_LOCK:
-                            conn = get_db_connection()
-                            uid = str(uuid.uuid4())
+                        uid = str(uuid.uuid4())
+                        conn = get_db_connection()
+                        with DB_LOCK, conn:
                             conn.execute("INSERT INTO items (id, name, url, target_price) VALUES (?,?,?,?)", 
                                          (uid, item_name, url, target))
-                            conn.commit()
-                            conn.close()
-                        st.success(f"Added: {item_name}")
+                        get_fetch_executor().submit(check_item_logic, uid, item_name, url, target, 0)
+                        invalidate_dashboard()
+                        st.success(f"Added: {item_name} (fetching price in background...)")
                         time.sleep(1)
                         st.rerun()
                     except Exception as e:
                         st.error(f"Failed to insert item (DB Write Error): {e}")
         
         st.divider()
+        if st.button("Refresh"):
+            invalidate_dashboard()
+            st.rerun()
         if st.button("Test Telegram"):
             ok, msg = send_telegram_message("✅ Test message from App")
             if ok: st.success("Sent!")
             else: st.error(f"Failed: {msg}")
 
     # --- Dashboard Data Loading ---
-    df = pd.DataFrame()
+    # Widget reruns reuse the cached watchlist; it's re-read only when the data has changed
     try:
-        with DB_LOCK:
-            conn = get_db_connection()
-            df = pd.read_sql('''
-                SELECT i.id, i.name, i.url, i.target_price, 
-                       p.price as current_price, p.status, p.checked_at
-                FROM items i
-                LEFT JOIN (
-                    SELECT item_id, price, status, checked_at FROM prices 
-                    WHERE id IN (SELECT MAX(id) FROM prices GROUP BY item_id)
-                ) p ON i.id = p.item_id
-            ''', conn)
-            conn.close()
+        items = load_dashboard(dashboard_version())
     except Exception as e:
         print(f"Main data load failed: {e}")
         st.warning("Database is initializing or empty. Add an item to start.")
-        df = pd.DataFrame() 
+        items = []
 
     # --- Display ---
-    if not df.empty:
-        for _, row in df.iterrows():
-            price = row['current_price']
+    if items:
+        for row in items:
             target = row['target_price']
             status = row['status'] if row['status'] else "Pending"
-            last_checked_ts = row['checked_at']
             
-            # 1. Safely determine display values and status
-            if price is None or price <= 0:
-                price_display = "Pending/Error"
-                icon = "⚠️"
-                lbl = "Status: Pending"
-            else:
-                price_display = f"₹{price:.2f}"
-                if price <= target and target > 0:
-                    icon = "🔥"
-                    lbl = f"DEAL! ({price_display})"
-                else:
-                    icon = "📈"
-                    lbl = f"Current: {price_display}"
+            # 1. Display values are precomputed by the poller; items not checked yet show as pending
+            icon = row['last_icon'] or "⚠️"
+            lbl = row['last_label'] or "Status: Pending"
+            price_display = row['last_price_display'] or "Pending/Error"
             
-            last_checked_str = datetime.fromtimestamp(last_checked_ts).strftime('%Y-%m-%d %H:%M') if last_checked_ts else 'Never'
+            last_checked_str = row['checked_at_str']
 
             # 2. Expander Display (Using the safe strings)
             with st.expander(f"{icon} {lbl} | Target: ₹{target:.2f} | {row['url'][:40]}...", expanded=True):
@@ -302,17 +492,17 @@ def main():
                 if c1.button("Check Now", key=f"chk_{row['id']}"):
                     with st.spinner("Checking..."):
                         check_item_logic(row['id'], row['name'], row['url'], row['target_price'], 0)
+                    invalidate_dashboard()
                     st.rerun()
                 
                 # Delete Item
                 if c2.button("Delete", key=f"del_{row['id']}"):
                     try:
-                        with DB_LOCK:
-                            conn = get_db_connection()
+                        conn = get_db_connection()
+                        with DB_LOCK, conn:
                             conn.execute("DELETE FROM items WHERE id=?", (row['id'],))
                             conn.execute("DELETE FROM prices WHERE item_id=?", (row['id'],))
-                            conn.commit()
-                            conn.close()
+                        invalidate_dashboard()
                         st.rerun()
                     except Exception as e:
                         st.error(f"Deletion Failed: {e}")
@@ -0,0 +1,83 @@
+# tracker_core.py — plumbing shared by the Streamlit dashboard and tracker_worker
+import sqlite3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- SQLite ---
+def open_connection(db_file, read_only=False, page_size=None, **connect_kwargs):
+    """Opens db_file with the pragmas every tracker connection uses.
+    page_size only applies when the file is new. Pass timeout= (sqlite3's busy timeout)
+    and other sqlite3.connect options as keywords."""
+    if read_only:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, **connect_kwargs)
+    else:
+        conn = sqlite3.connect(db_file, **connect_kwargs)
+        if page_size:
+            # Has to come before the switch to WAL; a no-op once the file exists
+            conn.execute(f"PRAGMA page_size={int(page_size)}")
+        # WAL: one fsync per commit and readers never block writers; NORMAL sync is durable enough under WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")    # ~20 MB page cache
+    conn.execute("PRAGMA mmap_size=268435456")  # read pages through a 256 MB memory map
+    return conn
+
+def add_column_if_missing(c, table, column, decl):
+    """Migrates databases created before a column existed. Returns True if it was added."""
+    # SQLite has no "ADD COLUMN IF NOT EXISTS", so check the schema first
+    columns = [r[1] for r in c.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+    return False
+
+# --- HTTP ---
+def make_session(pool_maxsize=32, retries=2, status_forcelist=None):
+    """One keep-alive pool for fetches and alerts, so repeat hosts skip the TCP+TLS handshake.
+    status_forcelist also retries those HTTP statuses (POSTs are never retried)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize,
+                          max_retries=Retry(total=retries, backoff_factor=0.3, status_forcelist=status_forcelist))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def response_encoding(response):
+    """Charset declared in the Content-Type header, else UTF-8. requests falls back to
+    ISO-8859-1 for text/* without a charset, which would turn "₹" into mojibake."""
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        return response.encoding or "utf-8"
+    return "utf-8"
+
+def conditional_headers(headers, etag=None, last_modified=None):
+    """Adds the validators from the last fetch, turning the request into a conditional GET."""
+    headers = dict(headers)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+# --- Telegram ---
+def post_telegram(session, bot_token, chat_id, text, **fields):
+    """Sends a message through the Bot API (form-encoded) and returns the response."""
+    return session.post(f"https://api.telegram.org/bot{bot_token}/sendMessage",
+                        data={"chat_id": chat_id, "text": text, **fields}, timeout=10)
+
+# --- Check decisions ---
+def carry_forward(last_price):
+    """Price to record for a 304: the last parsed price, or None if the last check failed (stored as -1)."""
+    return last_price if last_price is not None and last_price > 0 else None
+
+def validators_after(price, etag=None, last_modified=None):
+    """Validators to store after a check. They are only kept alongside a price: after a failure
+    the next poll must do a full GET, or a 304 would carry the failure forward indefinitely."""
+    return (etag, last_modified) if price is not None else (None, None)
+
+def alert_due(price, target, last_alert, cooldown, now):
+    """True when price is at or below a set target and the last alert is older than cooldown seconds."""
+    if price is None or price <= 0 or not target or target <= 0:
+        return False
+    return price <= target and now - (last_alert or 0) > cooldown
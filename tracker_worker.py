@@ -1,39 +1,61 @@
 # tracker_worker.py  — safe drop-in for Render
 import os
 import time
-import sqlite3
-import requests
 import re
+from concurrent.futures import ThreadPoolExecutor
+from tracker_core import (open_connection, add_column_if_missing, make_session, conditional_headers, post_telegram,
+                          carry_forward, validators_after, alert_due)
 
 DB_FILE = os.environ.get("DB_FILE", "prices.db")
 POLL_DELAY = int(os.environ.get("POLL_DELAY", 600))   # seconds
 COOLDOWN = int(os.environ.get("COOLDOWN", 86400))    # seconds
+RETENTION = int(os.environ.get("RETENTION", 180 * 86400))  # seconds of price history to keep
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 8))  # pages fetched concurrently
 
 BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 
 HEADERS = {"User-Agent": "Mozilla/5.0"}
+CHUNK_SIZE = 16384
+MAX_PAGE_CHARS = 512_000   # give up on a page after this much text
+SCAN_TAIL = 64             # rescan the buffer edge so a price split across chunks isn't missed
+
+SESSION = make_session()
 
 # ---------- DB helpers ----------
+# Hot-path statements as constants: identical strings hit sqlite3's per-connection statement cache
+SQL_INSERT_PRICE = "INSERT INTO prices(item_id, checked_at, price) VALUES(?,?,?)"
+SQL_UPDATE_LATEST = "UPDATE items SET last_price=?, last_checked_at=? WHERE id=?"
+SQL_UPDATE_VALIDATORS = "UPDATE items SET etag=?, last_modified=? WHERE id=?"
+SQL_UPDATE_ALERT = "UPDATE items SET last_alert_at=? WHERE id=?"
+# Only the columns a check uses, read as plain tuples in this order
+SQL_SELECT_ITEMS = "SELECT id, name, url, target_price, last_alert_at, last_price, etag, last_modified FROM items"
+
 def db_conn():
-    conn = sqlite3.connect(DB_FILE, timeout=30)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return open_connection(DB_FILE, timeout=30, cached_statements=256)
 
 def init_db():
     """Create tables if they don't exist (safe to run every start)."""
     conn = db_conn()
     c = conn.cursor()
-    c.execute('PRAGMA journal_mode=WAL;')
     c.execute("""
         CREATE TABLE IF NOT EXISTS items (
             id TEXT PRIMARY KEY,
             name TEXT,
             url TEXT,
             target_price REAL,
-            last_alert_at REAL DEFAULT 0
+            last_alert_at REAL DEFAULT 0,
+            etag TEXT,
+            last_modified TEXT,
+            last_price REAL,
+            last_checked_at REAL
         )
     """)
+    add_column_if_missing(c, "items", "etag", "TEXT")
+    add_column_if_missing(c, "items", "last_modified", "TEXT")
+    # Latest result lives on the item, so a 304 can carry it forward without searching prices
+    added = add_column_if_missing(c, "items", "last_price", "REAL")
+    added |= add_column_if_missing(c, "items", "last_checked_at", "REAL")
     c.execute("""
         CREATE TABLE IF NOT EXISTS prices (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -42,62 +64,133 @@ def init_db():
             price REAL
         )
     """)
+    # Per-item "latest row" lookups (MAX(id) / ORDER BY id DESC) become a seek to the index tail
+    c.execute("CREATE INDEX IF NOT EXISTS idx_prices_item ON prices(item_id, id DESC)")
+    # Retention prune seeks to the old rows instead of scanning the whole table
+    c.execute("CREATE INDEX IF NOT EXISTS idx_prices_checked_at ON prices(checked_at)")
+    if added:
+        c.execute("""
+            UPDATE items SET (last_price, last_checked_at) =
+                (SELECT price, checked_at FROM prices WHERE item_id = items.id ORDER BY id DESC LIMIT 1)
+        """)
     conn.commit()
     conn.close()
 
 # ---------- scraping and alert ----------
-def extract_price(html):
-    html = re.sub("<[^>]+>", " ", html)
-    m = re.findall(r"₹\s?([\d,]+\.?\d*)", html)
-    if not m:
-        return None
+# Matched against the raw HTML: "₹" followed by digits practically never occurs inside a tag,
+# so there's no need to strip tags (and copy the whole page) first
+PRICE_RE = re.compile(r"₹\s?([\d,]+\.?\d*)")
+
+def _match_price(m):
     try:
-        return float(m[0].replace(",", ""))
-    except:
+        return float(m.group(1).replace(",", ""))
+    except ValueError:
         return None
 
+def extract_price(html, pos=0):
+    m = PRICE_RE.search(html, pos)
+    return _match_price(m) if m else None
+
+def fetch_page_price(url, etag=None, last_modified=None):
+    """Streams the page and stops reading as soon as a price shows up.
+    Sends a conditional GET when validators from the last fetch are known.
+    Returns (status_code, price, etag, last_modified)."""
+    headers = conditional_headers(HEADERS, etag, last_modified)
+    with SESSION.get(url, headers=headers, timeout=15, stream=True) as r:
+        if r.status_code == 304:
+            return r.status_code, None, etag, last_modified
+        if r.status_code != 200:
+            return r.status_code, None, None, None
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if "charset" not in r.headers.get("Content-Type", "").lower():
+            r.encoding = "utf-8"   # apparent_encoding would need the whole body
+        buf = ""
+        pos = 0
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True):
+            buf += chunk
+            # Only scan text not searched yet. A match that reaches the end of the buffer
+            # may continue in the next chunk, so it's only trusted once more text follows it.
+            m = PRICE_RE.search(buf, pos)
+            if m and m.end() < len(buf):
+                return r.status_code, _match_price(m), etag, last_modified
+            pos = m.start() if m else max(0, len(buf) - SCAN_TAIL)
+            if len(buf) > MAX_PAGE_CHARS:
+                break
+        return r.status_code, extract_price(buf, pos), etag, last_modified
+
 def send_alert(name, price, url, target):
     if not BOT_TOKEN or not CHAT_ID:
         print("Telegram vars missing")
         return
     msg = f"🚨 PRICE DROP!\n\n{name}\nCurrent: ₹{price}\nTarget: ₹{target}\n{url}"
     try:
-        r = requests.post(
-            f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-            json={"chat_id": CHAT_ID, "text": msg},
-            timeout=10
-        )
+        r = post_telegram(SESSION, BOT_TOKEN, CHAT_ID, msg)
         print("Alert response:", r.status_code, r.text[:500])
     except Exception as e:
         print("Failed to send alert:", e)
 
+def fetch_item(it):
+    """Network-only part of a check, safe to run on a worker thread.
+    `it` is a SQL_SELECT_ITEMS row. Returns (it, fetch_page_price result), or (it, None) if the fetch raised."""
+    _, name, url, _, _, _, etag, last_modified = it
+    print("Checking:", name)
+    try:
+        return it, fetch_page_price(url, etag, last_modified)
+    except Exception as e:
+        print("Error checking item:", e)
+        return it, None
+
 def check_once():
     conn = db_conn()
     try:
-        items = conn.execute("SELECT * FROM items").fetchall()
+        items = conn.execute(SQL_SELECT_ITEMS).fetchall()
     except Exception as e:
         print("DB read error in check_once:", e)
         conn.close()
         return
 
-    for it in items:
-        print("Checking:", it["name"])
+    # Collect the sweep's writes and commit them together after the loop
+    price_rows, latest, validators, alerts = [], [], [], []
+    # Fetches are pure network wait, so overlap them; all DB work stays on this thread
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        fetched = list(pool.map(fetch_item, items))
+
+    for (iid, name, url, target, last_alert, last_price, _, _), result in fetched:
+        if result is None:
+            # The fetch raised: drop the validators so the next poll does a full GET
+            validators.append((None, None, iid))
+            continue
         try:
-            r = requests.get(it["url"], headers=HEADERS, timeout=15)
-            if r.status_code != 200:
-                print(f"Fetch failed {r.status_code} for {it['url']}")
+            status_code, price, etag, last_modified = result
+            if status_code == 304:
+                # Page unchanged since the last poll: carry the last price forward without parsing
+                price = carry_forward(last_price)
+            validators.append((*validators_after(price, etag, last_modified), iid))
+            if status_code not in (200, 304):
+                print(f"Fetch failed {status_code} for {url}")
                 continue
-            price = extract_price(r.text)
-            conn.execute("INSERT INTO prices(item_id, checked_at, price) VALUES(?,?,?)",
-                         (it["id"], time.time(), price if price is not None else -1))
-            conn.commit()
-
-            if price is not None and price <= (it["target_price"] or 0) and (time.time() - (it["last_alert_at"] or 0) > COOLDOWN):
-                send_alert(it["name"], price, it["url"], it["target_price"])
-                conn.execute("UPDATE items SET last_alert_at=? WHERE id=?", (time.time(), it["id"]))
-                conn.commit()
+            checked_at = time.time()
+            stored_price = price if price is not None else -1
+            price_rows.append((iid, checked_at, stored_price))
+            latest.append((stored_price, checked_at, iid))
+
+            if alert_due(price, target, last_alert, COOLDOWN, checked_at):
+                send_alert(name, price, url, target)
+                alerts.append((checked_at, iid))
         except Exception as e:
             print("Error checking item:", e)
+
+    # The whole cycle (prices, item state, alert times, retention prune) is one transaction: one fsync
+    try:
+        with conn:
+            conn.executemany(SQL_UPDATE_VALIDATORS, validators)
+            conn.executemany(SQL_INSERT_PRICE, price_rows)
+            conn.executemany(SQL_UPDATE_LATEST, latest)
+            conn.executemany(SQL_UPDATE_ALERT, alerts)
+            conn.execute("DELETE FROM prices WHERE checked_at < ?", (time.time() - RETENTION,))
+    except Exception as e:
+        print("DB write error in check_once:", e)
     conn.close()
 
 # ---------- main ----------